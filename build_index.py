@@ -5,8 +5,13 @@ This script should be placed in the same folder as `wiki-pages-text`.
 import os
 import sys
 import re
-from hashlib import sha1
-from typing import NewType, Dict, List, Tuple, Union, Set
+from hashlib import blake2b
+from functools import lru_cache
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, DefaultDict, Iterable, List, Optional, Tuple
 from time import strftime
 from traceback import print_exc
 
@@ -14,31 +19,34 @@ INPUT_FOLDER = "wiki-pages-text"
 INDEX_FOLDER = "docname-index"
 DOC_FOLDER = "indexed-docs"
 ENCODING = "utf-8"
+HASH_SIZE = 8
 SEPARATOR = "\\" if sys.platform == "win32" else "/"
 INPUT_FILE_COUNT = 109
 START_FILE = 1
 END_FILE = INPUT_FILE_COUNT
 FOLDER_SIZE = 100
-FILE_CAPACITY = 20000
-SAFE_STRING = "xmcgcg"
+BUCKET_DIGITS = 3
+FOLDER_DIGITS = 1
+WORKER_COUNT = os.cpu_count()
+READ_BUFFER_SIZE = 1 << 20
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Words in document names are separated by underscores and non-word characters.
+# ASCII names are split by translating all separators to spaces, which avoids the regular expression engine.
+NAME_SEPARATOR = re.compile(r"[_\W]+")
+NAME_SEPARATOR_TABLE = {code: " " for code in range(128) if not chr(code).isalnum()}
 
 # Type aliases indicating the data type
-# -- NameDict: dictionaries of words, which map to document names containing these words
-# -- IndexNode: nodes of the index tree of document names
+# -- NamePairs: lists of words and the document names containing these words
+# -- IndexBuckets: dictionaries of hash prefixes, which map to the word pairs sharing the prefix
+# -- DocContent: lists of the sentences in a document, indexed by sentence number, with None for missing numbers
 # -- SentDict: dictionaries of document names, which map to the sentences in the documents
-# -- DocNode: nodes of the index tree of the document sentences
-NameDict = Dict[str, Union[Set[str], int]]
-IndexNode = Dict[str, Union[NameDict, 'IndexNode']]
-SentDict = Dict[str, Union[Dict[int, str], int]]
-DocNode = Dict[str, Union[SentDict, 'DocNode']]
-
-# Variables used for displaying indexing progress
-word_count = 0
-doc_count = 0
-processed_word_count = 0
-processed_doc_count = 0
-word_count_1percent = 0
-doc_count_1percent = 0
+# -- DocBuckets: dictionaries of hash prefixes, which map to the documents sharing the prefix
+NamePairs = List[Tuple[str, str]]
+IndexBuckets = DefaultDict[str, NamePairs]
+DocContent = List[Optional[str]]
+SentDict = Dict[str, DocContent]
+DocBuckets = DefaultDict[str, SentDict]
 
 def transform_brackets(target: str) -> str:
     """Restores brackets in document strings.
@@ -50,15 +58,30 @@ def transform_brackets(target: str) -> str:
     """
     return target.replace("-LRB-", "(").replace("-RRB-", ")")
 
-def sha1_hash(target: str) -> str:
-    """Calculates the SHA-1 hash value of a string as a hexadecimal string.
+def hex_hash(target: str) -> str:
+    """Calculates a 64-bit BLAKE2b hash value of a string as a hexadecimal string.
+    The hash is only used to distribute words and document names over index files,
+    so a short digest is sufficient and SHA-1 strength is not needed.
     Parameter:
     -- target: str
     ---- The string whose hash value is going to be calculated.
     Return value: str
     -- The hexadecimal hash value of the target string.
     """
-    return sha1(bytes(target, ENCODING)).hexdigest()
+    return blake2b(target.encode(ENCODING), digest_size=HASH_SIZE).hexdigest()
+
+@lru_cache(maxsize=1 << 20)
+def hash_word(word: str) -> str:
+    """Calculates the hash value of a word, caching the results.
+    The same words recur across millions of document names,
+    so each distinct word only needs to be hashed once.
+    Parameter:
+    -- word: str
+    ---- The word whose hash value is going to be calculated.
+    Return value: str
+    -- The hexadecimal hash value of the word.
+    """
+    return hex_hash(word)
 
 def get_input_pathname(file_index: int) -> str:
     """Obtains the name of the original Wikipedia text file from a file number.
@@ -70,231 +93,247 @@ def get_input_pathname(file_index: int) -> str:
     """
     return f"{INPUT_FOLDER}{SEPARATOR}wiki-{file_index:03d}.txt"
 
-def expand_indices(doc_name_dict: NameDict, start_index: int) -> Dict[str, NameDict]:
-    """Expands the document name index tree if the leaf node storage reaches capacity.
-    Creates child nodes and distributes the stored data.
+def get_bucket_pathname(folder: str, bucket: str) -> str:
+    """Obtains the name of the index file storing a hash bucket.
+    Parameters:
+    -- folder: str
+    ---- The root folder of the index files.
+    -- bucket: str
+    ---- The hash prefix of the bucket.
+    Return value: str
+    -- The name of the index file.
+    """
+    return f"{folder}{SEPARATOR}{bucket[:FOLDER_DIGITS]}{SEPARATOR}{bucket}.txt"
+
+def make_bucket_folders(folder: str, buckets: Iterable[str]) -> None:
+    """Creates the folders holding the index files of the given hash buckets.
     Parameters:
-    -- doc_name_dict: NameDict
-    ---- The dictionary of stored document names in the leaf node.
-    -- start_index: int
-    ---- The index of the digit in the hash value of the word, correspoding to the level of children.
-    -- Return value: Dict[str, NameDict]:
-    ---- The new node with all children created.
+    -- folder: str
+    ---- The root folder of the index files.
+    -- buckets: Iterable[str]
+    ---- The hash prefixes of the buckets.
     """
-    result = {}
-    for (word, name_set) in doc_name_dict.items():
-        hash_digit = sha1_hash(word)[start_index]
-        if hash_digit not in result:
-            result[hash_digit] = {SAFE_STRING: 0}
-        result[hash_digit][word] = name_set
-        result[hash_digit][SAFE_STRING] += len(name_set) + 1
-    return result
+    for folder_digits in sorted(set(bucket[:FOLDER_DIGITS] for bucket in buckets)):
+        os.makedirs(f"{folder}{SEPARATOR}{folder_digits}", exist_ok=True)
 
-def add_doc_name_word(doc_name: str, word: str, index_dict: IndexNode, start_index: int = 0) -> None:
-    """Adds a pair of word and document name to the document name index tree.
+def add_doc_name_word(doc_name: str, word: str, index_buckets: IndexBuckets) -> None:
+    """Adds a pair of word and document name to the document name index.
     Parameters:
     -- doc_name: str
-    ---- The document name to be added to the index tree.
+    ---- The document name to be added to the index.
     -- word: str
-    ---- The word to be added to the index tree.
-    -- index_node: IndexNode
-    ---- The node of the index tree where the pair is going to be added.
-    -- start_index: int
-    ---- The index of the digit in the hash value of the word, correspoding to the current level.
+    ---- The word to be added to the index.
+    -- index_buckets: IndexBuckets
+    ---- The document name index where the pair is going to be added.
     """
-    word_hash = sha1_hash(word)
-    hash_digit = word_hash[start_index]
-    if hash_digit not in index_node:
-        index_node[hash_digit] = {SAFE_STRING: 0}
-    value = index_node[hash_digit]
-    if SAFE_STRING in value:
-        if word not in value:
-            value[word] = set()
-            global word_count
-            word_count += 1
-        value[word].add(doc_name)
-        value[SAFE_STRING] += 1
-        if value[SAFE_STRING] > FILE_CAPACITY >= len(value[word]) + 1:
-            del value[SAFE_STRING]
-            index_node[hash_digit] = expand_indices(value, start_index + 1)
-    else:
-        add_doc_name_word(doc_name, word, value, start_index + 1)
+    index_buckets[hash_word(word)[:BUCKET_DIGITS]].append((word, doc_name))
 
-def add_doc_name(doc_name: str, index_node: IndexNode) -> None:
-    """Adds all words in the document name and the document name itself to the index tree.
+def add_doc_name(doc_name: str, index_buckets: IndexBuckets) -> None:
+    """Adds all words in the document name and the document name itself to the index.
     Parameters:
     -- doc_name: str
-    ---- The document name to be added to the index tree.
-    -- index_node: IndexNode
-    ---- The node of the index tree where the pairs are going to be added.
+    ---- The document name to be added to the index.
+    -- index_buckets: IndexBuckets
+    ---- The document name index where the pairs are going to be added.
     """
-    doc_name_words = map(str.lower, filter(bool, re.split(r"[_\W]+", doc_name)))
+    if doc_name.isascii():
+        doc_name_words = doc_name.translate(NAME_SEPARATOR_TABLE).lower().split()
+    else:
+        doc_name_words = map(str.lower, filter(bool, NAME_SEPARATOR.split(doc_name)))
     for word in set(doc_name_words):
-        add_doc_name_word(doc_name, word, index_node)
+        add_doc_name_word(doc_name, word, index_buckets)
 
-def expand_docs(sent_dict: SentDict, start_index: int) -> Dict[str, SentDict]:
-    """Expands the document sentence index tree if the leaf node storage reaches capacity.
-    Creates child nodes and distributes the stored data.
+def set_sentence(doc_content: DocContent, sent_no: int, sentence: str) -> None:
+    """Stores a sentence in the sentence list of a document, padding the list if needed.
     Parameters:
-    -- sent_dict: SentDict
-    ---- The dictionary of stored sentences in the leaf node.
-    -- start_index: int
-    ---- The index of the digit in the hash value of the word, correspoding to the level of children.
-    -- Return value: Dict[str, SentDict]:
-    ---- The new node with all children created.
+    -- doc_content: DocContent
+    ---- The sentences of the document.
+    -- sent_no: int
+    ---- The sentence number.
+    -- sentence: str
+    ---- The sentence to be stored.
     """
-    result = {}
-    for (doc_name, doc_content) in sent_dict.items():
-        hash_digit = sha1_hash(doc_name)[start_index]
-        if hash_digit not in result:
-            result[hash_digit] = {SAFE_STRING: 0}
-        result[hash_digit][doc_name] = doc_content
-        result[hash_digit][SAFE_STRING] += len(doc_content) + 1
-    return result
+    if sent_no >= len(doc_content):
+        doc_content.extend([None] * (sent_no + 1 - len(doc_content)))
+    doc_content[sent_no] = sentence
 
-def add_doc_content(doc_name: str, doc_content: Dict[int, str],
-                    doc_node: DocNode, start_index: int = 0) -> None:
-    """Adds a pair of document name and sentence list to the document name index tree.
+def add_doc_content(doc_name: str, doc_content: DocContent, doc_buckets: DocBuckets) -> None:
+    """Adds a pair of document name and sentence list to the document sentence index.
     Parameters:
     -- doc_name: str
-    ---- The document name to be added to the index tree.
-    -- doc_content: Dict[int, str]
-    ---- The sentences of the document to be added to the index tree.
-    -- doc_node: DocNode
-    ---- The node of the index tree where the pair is going to be added.
-    -- start_index: int
-    ---- The index of the digit in the hash value of the document name, correspoding to the current level.
+    ---- The document name to be added to the index.
+    -- doc_content: DocContent
+    ---- The sentences of the document to be added to the index.
+    -- doc_buckets: DocBuckets
+    ---- The document sentence index where the pair is going to be added.
     """
-    name_hash = sha1_hash(doc_name)
-    hash_digit = name_hash[start_index]
-    if hash_digit not in doc_dict:
-        doc_dict[hash_digit] = {SAFE_STRING: 0}
-    value = doc_dict[hash_digit]
-    if SAFE_STRING in value:
-        global doc_count
-        doc_count += 1
-        value[doc_name] = doc_content
-        dict_len = len(doc_content) + 1
-        value[SAFE_STRING] += dict_len
-        if value[SAFE_STRING] > FILE_CAPACITY >= dict_len:
-            del value[SAFE_STRING]
-            doc_dict[hash_digit] = expand_docs(value, start_index + 1)
-    else:
-        add_doc_content(doc_name, doc_content, value, start_index + 1)
+    doc_buckets[hex_hash(doc_name)[:BUCKET_DIGITS]][doc_name] = doc_content
 
-def build_indices(index_node: IndexNode, index_folder: str = INDEX_FOLDER) -> None:
-    """Creates index folders and files based on the document name index tree.
+def index_file(file_index: int) -> Tuple[IndexBuckets, DocBuckets]:
+    """Indexes the document names and sentences of one original Wikipedia text file.
+    Each line consists of the document name, the sentence number and the sentence, separated by spaces.
+    The file is read as bytes, and only the document names and sentences kept are decoded.
+    Parameter:
+    -- file_index: int
+    ---- The file number of the text file.
+    Return value: Tuple[IndexBuckets, DocBuckets]
+    -- The document name index and the document sentence index of the file.
+    """
+    index_buckets = defaultdict(list)
+    doc_buckets = defaultdict(dict)
+    current_raw_doc = b""
+    current_doc = ""
+    current_sents = []
+    with open(get_input_pathname(file_index), "rb", buffering=READ_BUFFER_SIZE) as input_file_obj:
+        for line in input_file_obj:
+            name_end = line.find(b" ")
+            raw_doc_name = line if name_end == -1 else line[:name_end]
+            if raw_doc_name != current_raw_doc:
+                if current_doc:
+                    add_doc_name(current_doc, index_buckets)
+                    add_doc_content(current_doc, current_sents, doc_buckets)
+                current_raw_doc = raw_doc_name
+                current_doc = transform_brackets(raw_doc_name.decode(ENCODING))
+                current_sents = []
+            if name_end == -1:
+                continue
+            sent_no_end = line.find(b" ", name_end + 1)
+            if sent_no_end == -1:
+                continue
+            sent_no_bytes = line[name_end + 1:sent_no_end]
+            if sent_no_bytes.isdigit():
+                sentence = line[sent_no_end + 1:].rstrip(b"\r\n").decode(ENCODING)
+                set_sentence(current_sents, int(sent_no_bytes), sentence)
+    if current_doc:
+        add_doc_name(current_doc, index_buckets)
+        add_doc_content(current_doc, current_sents, doc_buckets)
+    return (index_buckets, doc_buckets)
+
+def merge_indices(index_buckets: IndexBuckets, file_buckets: IndexBuckets) -> None:
+    """Merges the document name index of one text file into the overall index.
+    Parameters:
+    -- index_buckets: IndexBuckets
+    ---- The overall document name index.
+    -- file_buckets: IndexBuckets
+    ---- The document name index of one text file.
+    """
+    for (bucket, name_pairs) in file_buckets.items():
+        index_buckets[bucket].extend(name_pairs)
+
+def merge_docs(doc_buckets: DocBuckets, file_buckets: DocBuckets) -> None:
+    """Merges the document sentence index of one text file into the overall index.
+    A document split across two text files has its sentences combined.
+    Parameters:
+    -- doc_buckets: DocBuckets
+    ---- The overall document sentence index.
+    -- file_buckets: DocBuckets
+    ---- The document sentence index of one text file.
+    """
+    for (bucket, file_sent_dict) in file_buckets.items():
+        sent_dict = doc_buckets[bucket]
+        for (doc_name, doc_content) in file_sent_dict.items():
+            if doc_name in sent_dict:
+                for (sent_no, sentence) in enumerate(doc_content):
+                    if sentence is not None:
+                        set_sentence(sent_dict[doc_name], sent_no, sentence)
+            else:
+                sent_dict[doc_name] = doc_content
+
+def build_indices(index_buckets: IndexBuckets, index_folder: str = INDEX_FOLDER) -> int:
+    """Creates index folders and files based on the document name index.
+    Each hash bucket is written to one file, grouped into folders by its first digit.
+    The word pairs of a bucket are sorted and grouped by word when the file is written.
     Parameters:
-    -- index_node: IndexNode
-    ---- The node of the document name index tree.
+    -- index_buckets: IndexBuckets
+    ---- The document name index.
     -- index_folder: str
     ---- The parent folder of all folders and files created by this function call.
+    Return value: int
+    -- The number of words indexed.
     """
-    for hash_digit in index_node:
-        value = index_node[hash_digit]
-        if SAFE_STRING in value:
-            del value[SAFE_STRING]
-            filename = f"{index_folder}{SEPARATOR}{hash_digit}.txt"
-            with open(filename, "w", encoding=ENCODING) as file_obj:
-                for word in value:
-                    file_obj.write(f"{word} {len(value[word])}\n")
-                    for doc_name in sorted(value[word]):
-                        file_obj.write(doc_name + "\n")
-                    global processed_word_count
-                    processed_word_count += 1
-                    if processed_word_count % word_count_1percent == 0:
-                        percentage = processed_word_count // word_count_1percent
-                        if 1 <= percentage <= 99:
-                            print(f"{percentage}% indices built at {strftime('%H:%M:%S')}")
-        else:
-            folder = f"{index_folder}{SEPARATOR}{hash_digit}"
-            os.mkdir(folder)
-            build_indices(value, folder)
-        value.clear()
+    pair_count = max(sum(map(len, index_buckets.values())), 1)
+    processed_pair_count = 0
+    reported_percentage = 0
+    word_count = 0
+    make_bucket_folders(index_folder, index_buckets)
+    for (bucket, name_pairs) in index_buckets.items():
+        name_pairs.sort()
+        lines = []
+        for (word, word_pairs) in groupby(name_pairs, key=itemgetter(0)):
+            doc_names = list(dict.fromkeys(map(itemgetter(1), word_pairs)))
+            lines.append(f"{word} {len(doc_names)}\n")
+            lines.extend(doc_name + "\n" for doc_name in doc_names)
+            word_count += 1
+        filename = get_bucket_pathname(index_folder, bucket)
+        with open(filename, "w", encoding=ENCODING, buffering=WRITE_BUFFER_SIZE) as file_obj:
+            file_obj.write("".join(lines))
+        processed_pair_count += len(name_pairs)
+        percentage = processed_pair_count * 100 // pair_count
+        if reported_percentage < percentage <= 99:
+            reported_percentage = percentage
+            print(f"{percentage}% indices built at {strftime('%H:%M:%S')}")
+        name_pairs.clear()
+    return word_count
 
-def build_docs(doc_node: DocNode, doc_folder: str = DOC_FOLDER) -> None:
-    """Creates index folders and files based on the document sentences index tree.
+def build_docs(doc_buckets: DocBuckets, doc_folder: str = DOC_FOLDER) -> int:
+    """Creates index folders and files based on the document sentence index.
+    Each hash bucket is written to one file, grouped into folders by its first digit.
     Parameters:
-    -- doc_node: DocNode
-    ---- The node of the document sentences index tree.
-    -- index_folder: str
+    -- doc_buckets: DocBuckets
+    ---- The document sentence index.
+    -- doc_folder: str
     ---- The parent folder of all folders and files created by this function call.
+    Return value: int
+    -- The number of documents indexed.
     """
-    for hash_digit in doc_node:
-        value = doc_node[hash_digit]
-        if SAFE_STRING in value:
-            del value[SAFE_STRING]
-            filename = f"{doc_folder}{SEPARATOR}{hash_digit}.txt"
-            with open(filename, "w", encoding=ENCODING) as file_obj:
-                for doc_name in value:
-                    file_obj.write(doc_name + "\n")
-                    for (sent_no, sentence) in sorted(value[doc_name].items()):
-                        file_obj.write(f"{sent_no} {transform_brackets(sentence)}")
-                    global processed_doc_count
-                    processed_doc_count += 1
-                    if processed_doc_count % doc_count_1percent == 0:
-                        percentage = processed_doc_count // doc_count_1percent
-                        if 1 <= percentage <= 99:
-                            print(f"{percentage}% documents indexed at {strftime('%H:%M:%S')}")
-        else:
-            folder = f"{doc_folder}{SEPARATOR}{hash_digit}"
-            os.mkdir(folder)
-            build_docs(value, folder)
-        value.clear()
+    doc_count = sum(map(len, doc_buckets.values()))
+    processed_doc_count = 0
+    reported_percentage = 0
+    make_bucket_folders(doc_folder, doc_buckets)
+    for (bucket, sent_dict) in doc_buckets.items():
+        lines = []
+        for doc_name in sent_dict:
+            lines.append(doc_name + "\n")
+            for (sent_no, sentence) in enumerate(sent_dict[doc_name]):
+                if sentence is not None:
+                    lines.append(f"{sent_no} {transform_brackets(sentence)}\n")
+        filename = get_bucket_pathname(doc_folder, bucket)
+        with open(filename, "w", encoding=ENCODING, buffering=WRITE_BUFFER_SIZE) as file_obj:
+            file_obj.write("".join(lines))
+        processed_doc_count += len(sent_dict)
+        percentage = processed_doc_count * 100 // max(doc_count, 1)
+        if reported_percentage < percentage <= 99:
+            reported_percentage = percentage
+            print(f"{percentage}% documents indexed at {strftime('%H:%M:%S')}")
+        sent_dict.clear()
+    return doc_count
 
 def index_documents() -> None:
     """Indexes all Wikipedia documents from text files.
+    The text files are read once, in parallel, and their indices merged afterwards.
     """
-
-    index_dict = {}
-    doc_dict = {}
-    current_doc = ""
-    current_sents = {}
-
-    first_round = True
+    file_indices = range(START_FILE, END_FILE + 1)
     try:
-        while True:
-            for file_index in range(START_FILE, END_FILE + 1):
+        index_buckets = defaultdict(list)
+        doc_buckets = defaultdict(dict)
+        with ProcessPoolExecutor(max_workers=WORKER_COUNT) as executor:
+            file_results = executor.map(index_file, file_indices)
+            for (file_index, (file_index_buckets, file_doc_buckets)) in zip(file_indices, file_results):
                 if file_index % 10 == 1:
-                    print(f"Start processing File {file_index} at {strftime('%H:%M:%S')}")
-                with open(get_input_pathname(file_index), "r", encoding=ENCODING) as input_file_obj:
-                    for line in input_file_obj:
-                        line_list = line.split(" ")
-                        doc_name = transform_brackets(line_list[0])
-                        if doc_name != current_doc:
-                            if current_doc:
-                                if first_round:
-                                    add_doc_name(current_doc, index_dict)
-                                else:
-                                    add_doc_content(current_doc, current_sents, doc_dict)
-                            current_doc = doc_name
-                            current_sents = {}
-                        if not first_round:
-                            sent_no_str = line_list[1]
-                            if sent_no_str.isdigit():
-                                sent_no = int(sent_no_str)
-                                current_sents[sent_no] = " ".join(line_list[2:])
-            if first_round:
-                add_doc_name(current_doc, index_dict)
-            else:
-                add_doc_content(current_doc, current_sents, doc_dict)
+                    print(f"Merging File {file_index} at {strftime('%H:%M:%S')}")
+                merge_indices(index_buckets, file_index_buckets)
+                merge_docs(doc_buckets, file_doc_buckets)
 
-            word_count_1percent = word_count // 100
-            doc_count_1percent = doc_count // 100
+        print(f"Start building indices at {strftime('%H:%M:%S')}")
+        os.mkdir(INDEX_FOLDER)
+        word_count = build_indices(index_buckets)
+        index_buckets.clear()
+
+        print(f"Start indexing documents at {strftime('%H:%M:%S')}")
+        os.mkdir(DOC_FOLDER)
+        doc_count = build_docs(doc_buckets)
+        doc_buckets.clear()
 
-            if first_round:
-                print(f"Start building indices at {strftime('%H:%M:%S')}")
-                os.mkdir(INDEX_FOLDER)
-                build_indices(index_dict)
-                index_dict.clear()
-                first_round = False
-            else:
-                print(f"Start indexing documents at {strftime('%H:%M:%S')}")
-                os.mkdir(DOC_FOLDER)
-                build_docs(doc_dict)
-                doc_dict.clear()
-                break
-            
         print("Complete!")
         print(f"{word_count} words and {doc_count} documents processed.")
     except Exception:
@@ -3,58 +3,81 @@
 
 import os.path
 import re
-from hashlib import sha1
-from typing import List, Tuple, Set, Dict
+from hashlib import blake2b
+from typing import Iterable, List, Tuple, Set, Dict
 from collections import defaultdict
+from functools import lru_cache
 
 INDEX_FOLDER = "docname-index"
 DOC_FOLDER = "indexed-docs"
 ENCODING = "utf-8"
+HASH_SIZE = 8
+BUCKET_DIGITS = 3
+FOLDER_DIGITS = 1
+INDEX_CACHE_SIZE = 1024
+SEARCH_CACHE_SIZE = 1 << 17
+DOC_CONTENT_CACHE_SIZE = 1 << 15
+WORD_SEPARATOR = re.compile(r"\W+")
 
-def sha1_hash(target: str) -> str:
-    """Calculates the SHA-1 hash value of a string as a hexadecimal string.
+def hex_hash(target: str) -> str:
+    """Calculates a 64-bit BLAKE2b hash value of a string as a hexadecimal string.
+    The hash is only used to distribute words and document names over index files,
+    so a short digest is sufficient and SHA-1 strength is not needed.
     Parameter:
     -- target: str
     ---- The string whose hash value is going to be calculated.
     Return value: str
     -- The hexadecimal hash value of the target string.
     """
-    return sha1(bytes(target, ENCODING)).hexdigest()
+    return blake2b(target.encode(ENCODING), digest_size=HASH_SIZE).hexdigest()
 
-def search_word(word: str) -> List[str]:
-    """Searches all documents name containing the search word.
+def get_bucket_pathname(folder: str, name_hash: str) -> str:
+    """Obtains the name of the index file which may contain a hashed word or document name.
+    Parameters:
+    -- folder: str
+    ---- The root folder of the index files.
+    -- name_hash: str
+    ---- The hexadecimal hash value of the word or document name.
+    Return value: str
+    -- The name of the index file.
+    """
+    bucket = name_hash[:BUCKET_DIGITS]
+    return os.path.join(folder, bucket[:FOLDER_DIGITS], bucket + ".txt")
+
+@lru_cache(maxsize=INDEX_CACHE_SIZE)
+def load_index_bucket(path: str) -> Dict[str, List[str]]:
+    """Parses a document name index file, caching the results.
+    Parameter:
+    -- path: str
+    ---- The name of the index file.
+    Return value: Dict[str, List[str]]
+    -- The dictionary of words in the file, which map to the document names containing these words.
+    """
+    name_dict = {}
+    if os.path.isfile(path):
+        with open(path, "r", encoding=ENCODING) as file_obj:
+            doc_name_list = None
+            for line in file_obj:
+                line_items = line.split()
+                line_len = len(line_items)
+                if line_len == 2:
+                    doc_name_list = name_dict[line_items[0]] = []
+                elif line_len == 1 and doc_name_list is not None:
+                    doc_name_list.append(line_items[0])
+    return name_dict
+
+@lru_cache(maxsize=SEARCH_CACHE_SIZE)
+def search_word(word: str) -> Tuple[str, ...]:
+    """Searches all documents name containing the search word, caching the results.
     ParametersL
     -- word: str
     ---- The search word. It should not contain any space.
-    Return value: List[str]
-    -- The list of all matching document names.
+    Return value: Tuple[str, ...]
+    -- All matching document names.
     """
-    word_hash = sha1_hash(word.lower())
-    path = INDEX_FOLDER
-    doc_name_list = []
-    for hash_digit in word_hash:
-        path += "\\" + hash_digit
-        if os.path.isdir(path):
-            continue
-        elif os.path.isfile(path + ".txt"):
-            with open(path + ".txt", "r", encoding=ENCODING) as file_obj:
-                word_found = False
-                for line in file_obj:
-                    line = line.strip()
-                    line_items = line.split()
-                    line_len = len(line_items)
-                    if word_found:
-                        if line_len == 1:
-                            doc_name_list.append(line_items[0])
-                        else:
-                            break
-                    else:
-                        if line_len == 2 and line_items[0] == word.lower():
-                            word_found = True
-            break
-        else:
-            return []
-    return doc_name_list
+    word = word.lower()
+    name_dict = load_index_bucket(get_bucket_pathname(INDEX_FOLDER, hex_hash(word)))
+    return tuple(name_dict.get(word, ()))
 
 def get_words(doc_name: str) -> List[str]:
     """Obtains all words in a document name.
@@ -68,25 +91,55 @@ def get_words(doc_name: str) -> List[str]:
     words = short_name.split("_")
     return list(map(str.lower, words))
 
-def get_valid_names(words: List[str], name_list: List[Tuple[str, List[str]]]) -> Set[Tuple[str, List[str]]]:
+def group_names(doc_names: Iterable[str]) -> Dict[str, List[Tuple[str, Tuple[str, ...]]]]:
+    """Groups document names by the first word of the names.
+    Parameter:
+    -- doc_names: Iterable[str]
+    ---- The document names.
+    Return value: Dict[str, List[Tuple[str, Tuple[str, ...]]]]
+    -- The dictionary of first words, which map to the document names and their words.
+    """
+    name_groups = defaultdict(list)
+    for name in doc_names:
+        word_list = tuple(get_words(name))
+        name_groups[word_list[0]].append((name, word_list))
+    return name_groups
+
+def get_valid_names(words: Tuple[str, ...],
+                    name_groups: Dict[str, List[Tuple[str, Tuple[str, ...]]]]) -> Set[Tuple[str, Tuple[str, ...]]]:
     """Filters all valid document names from a sentence.
     Parameters:
-    -- words: List[str]
-    ---- The list of word in the claim sentence.
-    -- name_list: List[Tuple[str, List[str]]]
-    ---- The list of document names and their words.
-    Return value: Set[Tuple[str, List[str]]]
+    -- words: Tuple[str, ...]
+    ---- The words in the claim sentence, starting from the current word.
+    -- name_groups: Dict[str, List[Tuple[str, Tuple[str, ...]]]]
+    ---- The document names and their words, grouped by their first words.
+    Return value: Set[Tuple[str, Tuple[str, ...]]]
     -- The set of all valid document names and their words.
     """
     valid_names = set()
-    for (name, word_list) in name_list:
+    for (name, word_list) in name_groups.get(words[0], ()):
         if words[:len(word_list)] == word_list:
-            valid_names.add((name, tuple(word_list)))
+            valid_names.add((name, word_list))
     return valid_names
 
-def absorb_doc_names(doc_names: Set[Tuple[str, List[str]]]) -> Set[str]:
+def contains_words(word_list: Tuple[str, ...], sub_list: Tuple[str, ...]) -> bool:
+    """Checks whether a list of words contains another list of words as a contiguous part.
+    Parameters:
+    -- word_list: Tuple[str, ...]
+    ---- The containing list of words.
+    -- sub_list: Tuple[str, ...]
+    ---- The contained list of words.
+    Return value: bool
+    -- Whether `sub_list` appears in `word_list`.
+    """
+    sub_len = len(sub_list)
+    return any(word_list[i:i + sub_len] == sub_list for i in range(len(word_list) - sub_len + 1))
+
+def absorb_doc_names(doc_names: Set[Tuple[str, Tuple[str, ...]]]) -> Set[str]:
     """Removes the document names which appear to be a substring of other document names.
-    Parameter: Set[Tuple[str, List[str]]]
+    Longer document names are checked first, so each name only needs to be compared
+    with the names already kept.
+    Parameter: Set[Tuple[str, Tuple[str, ...]]]
     -- The set of document names and their words.
     Return value: Set[str]
     -- The set of real document names.
@@ -94,23 +147,13 @@ def absorb_doc_names(doc_names: Set[Tuple[str, List[str]]]) -> Set[str]:
     name_dict = defaultdict(set)
     for (name, word_list) in doc_names:
         name_dict[word_list].add(name)
-    
-    words_set = set(map(lambda word_list: " ".join(word_list), name_dict.keys()))
-    new_set = set()
-    while words_set:
-        is_valid = True
-        words = words_set.pop()
-        for remain_words in words_set | new_set:
-            if words in remain_words:
-                is_valid = False
-                break
-        if is_valid:
-            new_set.add(words)
-    
+
+    kept_lists = []
     result = set()
-    for words in new_set:
-        word_list = words.split()
-        result |= name_dict[tuple(word_list)]
+    for word_list in sorted(name_dict, key=len, reverse=True):
+        if not any(contains_words(kept_list, word_list) for kept_list in kept_lists):
+            kept_lists.append(word_list)
+            result |= name_dict[word_list]
     return result
 
 def search_sentence(sentence: str, stop_words: Set[str]) -> List[str]:
@@ -123,24 +166,22 @@ def search_sentence(sentence: str, stop_words: Set[str]) -> List[str]:
     Return value: List[str]
     -- The list of matching document names.
     """
-    words = re.split(r"\W+", sentence)
-    words = list(filter(bool, words))
+    words = [word for word in WORD_SEPARATOR.split(sentence) if word]
+    lower_words = tuple(word.lower() for word in words)
+    is_ne_list = [not word[0].islower() for word in words]
 
     doc_names = {}
     ne_doc_names = {}
-    for word in words:
-        if word and word not in stop_words:
-            target_dict = doc_names if word[0].islower() else ne_doc_names
-            word = word.lower()
-            if word not in target_dict:
-                target_dict[word] = [(name, get_words(name)) for name in search_word(word)]
-    
-    lower_words = list(map(str.lower, words))
+    for (word, lower_word, is_ne) in zip(words, lower_words, is_ne_list):
+        if word not in stop_words:
+            target_dict = ne_doc_names if is_ne else doc_names
+            if lower_word not in target_dict:
+                target_dict[lower_word] = group_names(search_word(lower_word))
+
     result = set()
     ne_found = False
-    for i in range(len(words)):
-        target_dict = doc_names if words[i][0].islower() else ne_doc_names
-        is_ne = target_dict is ne_doc_names
+    for (i, is_ne) in enumerate(is_ne_list):
+        target_dict = ne_doc_names if is_ne else doc_names
         if not ne_found and is_ne:
             ne_found = True
             result.clear()
@@ -148,41 +189,33 @@ def search_sentence(sentence: str, stop_words: Set[str]) -> List[str]:
             result |= get_valid_names(lower_words[i:], target_dict[lower_words[i]])
     return list(absorb_doc_names(result))
 
-def get_doc_content(doc_name: str) -> List[Tuple[int, str]]:
-    """Retrieves all sentences of a document.
+@lru_cache(maxsize=DOC_CONTENT_CACHE_SIZE)
+def get_doc_content(doc_name: str) -> Tuple[Tuple[int, str], ...]:
+    """Retrieves all sentences of a document, caching the results.
+    The indexed document file is only read up to the end of the document.
     Parameter:
     -- doc_name: str
     ---- The name of the document whose sentences are going to be retrieved.
-    Return value: List[Tuple[int, str]]
+    Return value: Tuple[Tuple[int, str], ...]
     -- The sentences of the document.
     """
-    name_hash = sha1_hash(doc_name)
-    path = DOC_FOLDER
+    path = get_bucket_pathname(DOC_FOLDER, hex_hash(doc_name))
     doc_content = []
-    for hash_digit in name_hash:
-        path += "\\" + hash_digit
-        if os.path.isdir(path):
-            continue
-        elif os.path.isfile(path + ".txt"):
-            with open(path + ".txt", "r", encoding=ENCODING) as file_obj:
-                name_found = False
-                for line in file_obj:
-                    line = line.strip()
-                    if name_found:
-                        space_index = line.find(" ")
-                        if space_index != -1:
-                            sent_no = int(line[:space_index])
-                            sentence = line[space_index + 1:]
-                            doc_content.append((sent_no, sentence))
-                        else:
-                            break
-                    else:
-                        if line == doc_name:
-                            name_found = True
-            break
-        else:
-            return []
-    return doc_content
+    if os.path.isfile(path):
+        with open(path, "r", encoding=ENCODING) as file_obj:
+            name_found = False
+            for line in file_obj:
+                line = line.rstrip("\n")
+                space_index = line.find(" ")
+                if name_found:
+                    if space_index == -1:
+                        break
+                    sent_no = int(line[:space_index])
+                    sentence = line[space_index + 1:].strip()
+                    doc_content.append((sent_no, sentence))
+                elif space_index == -1 and line == doc_name:
+                    name_found = True
+    return tuple(doc_content)
 
 if __name__ == '__main__':
     print(search_sentence("Soul Food", set()))
\ No newline at end of file
@@ -1,21 +1,30 @@
 """Evaluates all possible evidences.
 """
 
-from typing import Tuple, Dict, Iterable, Any, Optional, Set, List
+from typing import Tuple, Dict, FrozenSet, Iterable, Iterator, Any, Optional, Set, List
 from itertools import groupby
+from collections import deque
 
+import numpy as np
+import torch
 from allennlp.predictors.predictor import Predictor
 
 from document_getter import search_sentence, get_doc_content
 
 UNKNOWN_LABEL = "NOT ENOUGH INFO"
+BATCH_SIZE = 256
+QUANTIZED_MODULES = ("_attend_feedforward", "_compare_feedforward", "_aggregate_feedforward")
 
-def get_evidence(doc_names: List[str]) -> Dict[str, List[Tuple[int, str]]]:
+# Type alias indicating the data type
+# -- SentencePair: pairs of premise and hypothesis to be checked for text entailment
+SentencePair = Tuple[str, str]
+
+def get_evidence(doc_names: List[str]) -> Dict[str, Tuple[Tuple[int, str], ...]]:
     """Obtains evidences of a list of documents.
     Parameter:
     -- doc_names: List[str]
     ---- The list of all document names.
-    Return value: Dict[str, List[Tuple[int, str]]]
+    Return value: Dict[str, Tuple[Tuple[int, str], ...]]
     -- All possible evidence.
     """
     evidence = {}
@@ -25,27 +34,130 @@ def get_evidence(doc_names: List[str]) -> Dict[str, List[Tuple[int, str]]]:
             evidence[doc_name] = doc_content
     return evidence
 
-def check_claim(claim: str, train_evidence: Set[Tuple[str, int]], label: str,
-                correctness_predictor: Predictor, stop_words: Set[str]) -> Tuple[List[List[float]], List[str]]:
+def quantize_predictor(correctness_predictor: Predictor) -> Predictor:
+    """Quantizes the weights of the feedforward layers of the text entailment model to 8-bit integers.
+    Only the attend, compare and aggregate feedforward networks of the decomposable attention model are quantized;
+    the ELMo embedder is left in full precision.
+    Dynamic quantization is only supported on CPU, so a predictor running on a GPU is left unchanged.
+    Parameter:
+    -- correctness_predictor: Predictor
+    ---- A predictor for text entailment.
+    Return value: Predictor
+    -- The predictor with its feedforward layers quantized.
+    """
+    model = correctness_predictor._model
+    if next(model.parameters()).is_cuda:
+        return correctness_predictor
+    module_names = {name for (name, _) in model.named_children() if name in QUANTIZED_MODULES}
+    if module_names:
+        correctness_predictor._model = torch.quantization.quantize_dynamic(
+            model, module_names, dtype=torch.qint8)
+    return correctness_predictor
+
+def run_batches(pairs: List[SentencePair], correctness_predictor: Predictor,
+                batch_size: int = BATCH_SIZE) -> Iterator[List[float]]:
+    """Runs the text entailment predictor over sentence pairs in batches.
+    Mixed precision is used when the predictor runs on a GPU.
+    Parameters:
+    -- pairs: List[SentencePair]
+    ---- The pairs of premise and hypothesis.
+    -- correctness_predictor: Predictor
+    ---- A predictor for text entailment.
+    -- batch_size: int
+    ---- The number of pairs fed to the predictor at once.
+    Return value: Iterator[List[float]]
+    -- The entailment and contradiction probabilities of each pair, in order.
+    """
+    on_gpu = next(correctness_predictor._model.parameters()).is_cuda
+    for start in range(0, len(pairs), batch_size):
+        batch = [{"premise": premise, "hypothesis": hypothesis}
+                 for (premise, hypothesis) in pairs[start:start + batch_size]]
+        with torch.autocast("cuda", enabled=on_gpu):
+            predict_results = correctness_predictor.predict_batch_json(batch)
+        for predict_result in predict_results:
+            yield predict_result["label_probs"][:2]
+
+def predict_probabilities(pairs: List[SentencePair], correctness_predictor: Predictor) -> np.ndarray:
+    """Predicts the entailment probabilities of sentence pairs.
+    Each distinct pair is only predicted once, however often it appears among the given pairs.
+    Parameters:
+    -- pairs: List[SentencePair]
+    ---- The pairs of premise and hypothesis.
+    -- correctness_predictor: Predictor
+    ---- A predictor for text entailment.
+    Return value: np.ndarray
+    -- An array of shape (N, 2) with the entailment and contradiction probabilities of each pair.
+    """
+    unique_pairs = list(dict.fromkeys(pairs))
+    predictions = dict(zip(unique_pairs, run_batches(unique_pairs, correctness_predictor)))
+    probabilities = [predictions[pair] for pair in pairs]
+    return np.array(probabilities, dtype=float).reshape(-1, 2)
+
+def predict_claims(claim_pairs: Iterable[Tuple[Any, List[SentencePair]]], correctness_predictor: Predictor,
+                   batch_size: int = BATCH_SIZE) -> Iterator[Tuple[Any, np.ndarray]]:
+    """Predicts the entailment probabilities of the sentence pairs of claims as they arrive.
+    Pairs are buffered until a full batch is pending, so only about one batch is held in memory at a time.
+    Parameters:
+    -- claim_pairs: Iterable[Tuple[Any, List[SentencePair]]]
+    ---- The sentence pairs of each claim, together with a key identifying the claim.
+    -- correctness_predictor: Predictor
+    ---- A predictor for text entailment.
+    -- batch_size: int
+    ---- The number of pairs fed to the predictor at once.
+    Return value: Iterator[Tuple[Any, np.ndarray]]
+    -- The key of each claim and the probabilities of its pairs, in the order of the claims.
+    """
+    pending_pairs = []
+    predicted = []
+    claim_queue = deque()
+
+    def pop_claims() -> Iterator[Tuple[Any, np.ndarray]]:
+        while claim_queue and claim_queue[0][1] <= len(predicted):
+            (key, pair_count) = claim_queue.popleft()
+            yield (key, np.array(predicted[:pair_count], dtype=float).reshape(-1, 2))
+            del predicted[:pair_count]
+
+    for (key, pairs) in claim_pairs:
+        pending_pairs.extend(pairs)
+        claim_queue.append((key, len(pairs)))
+        while len(pending_pairs) >= batch_size:
+            predicted.extend(predict_probabilities(pending_pairs[:batch_size], correctness_predictor))
+            del pending_pairs[:batch_size]
+        yield from pop_claims()
+    if pending_pairs:
+        predicted.extend(predict_probabilities(pending_pairs, correctness_predictor))
+    yield from pop_claims()
+
+def check_claim(claim: str, train_evidence: FrozenSet[Tuple[str, int]], label: str,
+                stop_words: Set[str]) -> Tuple[List[SentencePair], List[str]]:
+    """Collects the sentence pairs of a training claim and their target labels.
+    Parameters:
+    -- claim: str
+    ---- The claim to be checked.
+    -- train_evidence: FrozenSet[Tuple[str, int]]
+    ---- The document names and sentence numbers of the labelled evidence.
+    -- label: str
+    ---- The label of the claim.
+    -- stop_words: Set[str]
+    ---- A set of stop words to be used for filtering documents.
+    Return value: Tuple[List[SentencePair], List[str]]
+    -- The pairs of evidence sentence and claim, and the target label of each pair.
+    """
     print("Checking claim:", claim)
     doc_names = search_sentence(claim, stop_words)
     evidence = get_evidence(doc_names)
 
-    probabilities = []
+    pairs = []
     labels = []
 
     for doc_name in evidence:
         print("Checking doc:", doc_name)
-        sentences = evidence[doc_name]
-        for (sent_no, sentence) in sentences:
-            predict_result = correctness_predictor.predict(premise=sentence, hypothesis=claim)
-            sent_probabilities = predict_result["label_probs"][:2]
-            probabilities.append(sent_probabilities)
-
-            original_doc_name = doc_name.replace("(", "-LRB-").replace(")", "-RRB-")
-            if [original_doc_name, sent_no] in train_evidence:
+        original_doc_name = doc_name.replace("(", "-LRB-").replace(")", "-RRB-")
+        for (sent_no, sentence) in evidence[doc_name]:
+            pairs.append((sentence, claim))
+            if (original_doc_name, sent_no) in train_evidence:
                 labels.append(label)
             else:
                 labels.append(UNKNOWN_LABEL)
 
-    return (probabilities, labels)
\ No newline at end of file
+    return (pairs, labels)
\ No newline at end of file
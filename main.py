@@ -11,6 +11,7 @@ from allennlp.predictors.predictor import Predictor
 
 from train_model import train_SVC_model
 from run_model import run_SVC_model
+from evidence_evaluator import quantize_predictor
 
 TRAIN_FILE = "train.json"
 DEV_FILE = "devset.json"
@@ -19,7 +20,12 @@ TEST_FILE = "test-unlabelled.json"
 TEST_RESULT_FILE = "test-labelled.json"
 
 TE_PATH = "https://s3-us-west-2.amazonaws.com/allennlp/models/decomposable-attention-elmo-2018.02.19.tar.gz"
+# INT8 quantization of the entailment model on CPU, off until its effect on devset accuracy is measured
+QUANTIZE_PREDICTOR = False
+
 correctness_predictor = Predictor.from_path(TE_PATH)
+if QUANTIZE_PREDICTOR:
+    correctness_predictor = quantize_predictor(correctness_predictor)
 
 nltk.download("stopwords")
 stop_words = set(stopwords.words())
@@ -1,14 +1,15 @@
 """Runs the trained model.
 """
 
-from typing import Set
+from typing import Set, Iterator, Tuple, List
 
+import numpy as np
 from sklearn.svm import SVC
 from allennlp.predictors.predictor import Predictor
 
 from document_getter import search_sentence
 from json_processor import read_json_file, write_json_file
-from evidence_evaluator import get_evidence
+from evidence_evaluator import get_evidence, predict_claims, SentencePair
 
 SUPPORT_LABEL = "SUPPORTS"
 REFUTE_LABEL = "REFUTES"
@@ -17,6 +18,7 @@ UNKNOWN_LABEL = "NOT ENOUGH INFO"
 def run_SVC_model(model: SVC, input_filename: str, output_filename: str,
                   correctness_predictor: Predictor, stop_words: Set[str]) -> None:
     """Runs the SVC model with given dataset.
+    The sentence pairs of the claims are predicted in batches as the claims are searched.
     Parameters:
     -- model: SVC
     ---- The SVC model to be run.
@@ -30,25 +32,29 @@ def run_SVC_model(model: SVC, input_filename: str, output_filename: str,
     ---- A set of stop words to be used for filtering documents.
     """
     input_data = read_json_file(input_filename)
+
+    def claim_pairs() -> Iterator[Tuple[Tuple[str, List[Tuple[str, int]]], List[SentencePair]]]:
+        for case_id in input_data:
+            claim = input_data[case_id]["claim"]
+            evidence = get_evidence(search_sentence(claim, stop_words))
+            evidence_keys = []
+            pairs = []
+            for doc_name in evidence:
+                for (sent_no, sentence) in evidence[doc_name]:
+                    evidence_keys.append((doc_name, sent_no))
+                    pairs.append((sentence, claim))
+            yield ((case_id, evidence_keys), pairs)
+
     output_data = {}
-    for case_id in input_data:
+    for ((case_id, evidence_keys), probabilities) in predict_claims(claim_pairs(), correctness_predictor):
         support_sents = set()
         refute_sents = set()
-        case_item = input_data[case_id]
-        claim = case_item["claim"]
-        evidence = get_evidence(search_sentence(claim, stop_words))
-        for doc_name in evidence:
-            sentences = evidence[doc_name]
-            for (sent_no, sentence) in sentences:
-                predict_result = correctness_predictor.predict(premise=sentence, hypothesis=claim)
-                sent_proabilities = predict_result["label_probs"][:2]
-                predicted_label = model.predict([sent_proabilities])[0]
-                if predicted_label == SUPPORT_LABEL:
-                    support_sents.add([doc_name, sent_no])
-                elif predicted_label == REFUTE_LABEL:
-                    refute_sents.add([doc_name, sent_no])
-        
-        output_item = {"claim": claim}
+        if evidence_keys:
+            claim_labels = model.predict(probabilities)
+            support_sents = {evidence_keys[i] for i in np.flatnonzero(claim_labels == SUPPORT_LABEL)}
+            refute_sents = {evidence_keys[i] for i in np.flatnonzero(claim_labels == REFUTE_LABEL)}
+
+        output_item = {"claim": input_data[case_id]["claim"]}
         if not support_sents and not refute_sents:
             output_item["label"] = UNKNOWN_LABEL
             output_item["evidence"] = []
@@ -1,18 +1,19 @@
 """Trains a model.
 """
 
-from typing import Tuple, List, Set
+from typing import Tuple, List, Set, Iterator
 
 import numpy as np
 from sklearn.svm import SVC
 from allennlp.predictors.predictor import Predictor
 
 from json_processor import read_json_file
-from evidence_evaluator import check_claim
+from evidence_evaluator import check_claim, predict_claims, SentencePair
 
 def get_train_data(train_filename: str, correctness_predictor: Predictor,
-                   stop_words: Set[str]) -> Tuple[List[List[float]], List[str]]:
+                   stop_words: Set[str]) -> Tuple[np.ndarray, List[str]]:
     """Retrieves training dataset.
+    The sentence pairs of the claims are predicted in batches as the claims are checked.
     Parameters:
     -- train_filename: str
     ---- The name of the JSON file containing the training dataset.
@@ -20,21 +21,26 @@ def get_train_data(train_filename: str, correctness_predictor: Predictor,
     ---- A predictor for text entailment.
     -- stop_words: Set[str]
     ---- A set of stop words to be used for filtering documents.
-    Return value: Tuple[List[List[float]], List[str]]
+    Return value: Tuple[np.ndarray, List[str]]
     -- The training dataset, consists of:
-    ---- A list of 2D-vector probabilities.
+    ---- An array of 2D-vector probabilities.
     ---- A list of target labels.
     """
     train_data = read_json_file(train_filename)
+
+    def claim_pairs() -> Iterator[Tuple[List[str], List[SentencePair]]]:
+        for case_item in train_data.values():
+            train_evidence = frozenset((doc_name, sent_no) for (doc_name, sent_no) in case_item["evidence"])
+            case_pairs, case_labels = check_claim(case_item["claim"], train_evidence,
+                                                  case_item["label"], stop_words)
+            yield (case_labels, case_pairs)
+
     probabilities = []
     labels = []
-    data_len = len(train_data)
-    for case_item in train_data.values():
-        case_probs, case_labels = check_claim(case_item["claim"], case_item["evidence"],
-                                              case_item["label"], correctness_predictor, stop_words)
-        probabilities.extend(case_probs)
+    for (case_labels, case_probabilities) in predict_claims(claim_pairs(), correctness_predictor):
+        probabilities.append(case_probabilities)
         labels.extend(case_labels)
-    return (probabilities, labels)
+    return (np.concatenate(probabilities or [np.empty((0, 2))]), labels)
 
 def train_SVC_model(train_filename: str, correctness_predictor: Predictor, stop_words: Set[str]) -> SVC:
     """Trains a SVC model.
@@ -49,7 +55,6 @@ def train_SVC_model(train_filename: str, correctness_predictor: Predictor, stop_
     -- The trained SVC model.
     """
     probabilities, labels = get_train_data(train_filename, correctness_predictor, stop_words)
-    prob_array = np.array(probabilities)
     my_SVC = SVC(gamma="scale")
-    my_SVC.fit(prob_array, labels)
+    my_SVC.fit(probabilities, labels)
     return my_SVC
\ No newline at end of file